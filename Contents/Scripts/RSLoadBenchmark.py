@@ -0,0 +1,197 @@
+# Copyright 2024 Benjamin Mikhaiel
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Measures how expensive an exported layer is to open downstream (Solaris, usdview, ...).
+# This does not need maya, run it with any python that has pxr available:
+#
+#   python RSLoadBenchmark.py scene.usda --output before.json
+#   python RSLoadBenchmark.py scene.usda --compare before.json
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pxr import Usd, UsdShade
+
+renderContext = "Redshift"
+
+
+def timeIt(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def countSpecs(prim):
+    #every prim and property spec that composes into the prim, across sublayers and references
+    specs = 0
+    for primSpec in prim.GetPrimStack():
+        specs += 1 + len(primSpec.properties)
+    return specs
+
+
+def countConnections(prim):
+    connections = 0
+    for attr in prim.GetAttributes():
+        connections += len(attr.GetConnections())
+    return connections
+
+
+def surfaceSourceContext(material):
+    #newer usd takes a list of render contexts, older builds only take a single token
+    try:
+        material.ComputeSurfaceSource([renderContext])
+        return [renderContext]
+    except TypeError: #Boost.Python.ArgumentError
+        return renderContext
+
+
+def measureMaterial(material, context, resolveRepeat):
+    materialPrim = material.GetPrim()
+    prims = 0
+    specs = 0
+    connections = 0
+    for prim in Usd.PrimRange(materialPrim):
+        prims += 1
+        specs += countSpecs(prim)
+        connections += countConnections(prim)
+
+    resolveTimes = []
+    source = None
+    for i in range(resolveRepeat):
+        result, elapsed = timeIt(material.ComputeSurfaceSource, context)
+        resolveTimes.append(elapsed)
+        source = result[0] if result else None
+
+    return {"prims": prims,
+            "specs": specs,
+            "connections": connections,
+            "resolved": bool(source),
+            "resolveTime": min(resolveTimes)}
+
+
+def runOnce(layerPath, resolveRepeat):
+    #open the file the way solaris/usdview do, nothing holds the layers between runs so they are read from disk every time
+    stage, openTime = timeIt(Usd.Stage.Open, layerPath)
+    if stage is None:
+        raise RuntimeError("Could not open layer %s" % layerPath)
+    #opening again while the first stage keeps every layer in memory leaves only the composition cost
+    stage, compositionTime = timeIt(Usd.Stage.Open, stage.GetRootLayer())
+
+    materials = {}
+    context = None
+    for prim in stage.Traverse():
+        if prim.IsA(UsdShade.Material):
+            material = UsdShade.Material(prim)
+            if context is None:
+                context = surfaceSourceContext(material)
+            materials[str(prim.GetPath())] = measureMaterial(material, context, resolveRepeat)
+
+    return {"openTime": openTime,
+            "compositionTime": compositionTime,
+            "materials": materials}
+
+
+def benchmark(layerPath, repeat=5, resolveRepeat=10):
+    runs = [runOnce(layerPath, resolveRepeat) for i in range(repeat)]
+
+    materials = {}
+    for path, stats in runs[0]["materials"].items():
+        stats = dict(stats)
+        stats["resolveTime"] = statistics.median(run["materials"][path]["resolveTime"] for run in runs)
+        materials[path] = stats
+
+    return {"layer": layerPath,
+            "repeat": repeat,
+            "openTime": statistics.median(run["openTime"] for run in runs),
+            "compositionTime": statistics.median(run["compositionTime"] for run in runs),
+            "resolveTime": sum(stats["resolveTime"] for stats in materials.values()),
+            "prims": sum(stats["prims"] for stats in materials.values()),
+            "specs": sum(stats["specs"] for stats in materials.values()),
+            "connections": sum(stats["connections"] for stats in materials.values()),
+            "materials": materials}
+
+
+def formatValue(key, value):
+    if key.endswith("Time"):
+        return "%.3f ms" % (value * 1000.0)
+    return str(value)
+
+
+def formatDelta(key, value, baseline):
+    if baseline is None:
+        return "(new)"
+    delta = value - baseline
+    if baseline:
+        percent = "%+.1f%%" % (delta / baseline * 100.0)
+    elif delta:
+        percent = "n/a"
+    else:
+        percent = "+0.0%"
+    if key.endswith("Time"):
+        return "%+.3f ms (%s)" % (delta * 1000.0, percent)
+    return "%+d (%s)" % (delta, percent)
+
+
+def printReport(report, baseline=None):
+    totalKeys = ["openTime", "compositionTime", "resolveTime", "prims", "specs", "connections"]
+    materialKeys = ["prims", "specs", "connections", "resolveTime"]
+
+    print("Layer: %s (median of %d runs)" % (report["layer"], report["repeat"]))
+    for key in totalKeys:
+        line = "  %-16s %s" % (key, formatValue(key, report[key]))
+        if baseline is not None:
+            line += "  " + formatDelta(key, report[key], baseline.get(key))
+        print(line)
+
+    baselineMaterials = baseline["materials"] if baseline is not None else {}
+    for path, stats in sorted(report["materials"].items()):
+        print(path + ("" if stats["resolved"] else "  (no %s surface output)" % renderContext))
+        for key in materialKeys:
+            line = "  %-16s %s" % (key, formatValue(key, stats[key]))
+            if baseline is not None:
+                line += "  " + formatDelta(key, stats[key], baselineMaterials.get(path, {}).get(key))
+            print(line)
+
+    if baseline is not None:
+        for path in sorted(set(baselineMaterials) - set(report["materials"])):
+            print(path + "  (removed)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the downstream load cost of an exported Redshift USD layer.")
+    parser.add_argument("layer", help="exported usd layer to open")
+    parser.add_argument("--repeat", type=int, default=5, help="number of times the layer is opened")
+    parser.add_argument("--resolve-repeat", type=int, default=10, help="number of surface resolves per material per run")
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="json file from a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.layer, max(args.repeat, 1), max(args.resolve_repeat, 1))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    printReport(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
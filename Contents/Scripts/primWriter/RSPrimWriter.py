@@ -1,68 +1,114 @@
 import mayaUsd
-from pxr import UsdLux, Sdf, Gf
+from pxr import Usd, UsdLux, Sdf, Gf
 import maya.api.OpenMaya as om2
 import traceback
 
 
+lightPlugNames = ["lightType", "areaShape", "intensity", "exposure", "colorMode", "temperature", "color"]
+#plugs that make up a light preset, lights sharing these values share a prototype
+presetPlugNames = ["intensity", "exposure", "colorMode", "temperature", "color"]
+
+
 class RSLightPrimWriter(mayaUsd.lib.PrimWriter):
+    """Lights with the same shape and settings reference one shared prototype under /RSLightPrototypes,
+    only animated lights author their values on the light prim itself.
+    The prototypes live outside the light's own subtree, so anything that copies just the light prims into
+    another layer has to bring /RSLightPrototypes along. Exports to an anonymous layer (mayaUsd merge/push
+    of a pulled prim) are copied that way, so there every light authors its values locally instead."""
+    prototypeRoot = Sdf.Path("/RSLightPrototypes")
+    presetKey = "rsLightPreset"
+
     def __init__(self, *args, **kwargs):
 
         super(RSLightPrimWriter, self).__init__(*args, **kwargs)
 
         node = om2.MFnDependencyNode(self.GetMayaObject())
-        lightType = node.findPlug("lightType", True).asInt()
+        self.plugs = {name: node.findPlug(name, True) for name in lightPlugNames}
+
+        lightType = self.plugs["lightType"].asInt()
         if lightType == 0: #area
-            shape = node.findPlug("areaShape", True).asInt()
+            shape = self.plugs["areaShape"].asInt()
             if shape == 0:
-                primSchema = UsdLux.RectLight.Define(self.GetUsdStage(), self.GetUsdPath())
+                self.schema = UsdLux.RectLight
             elif shape == 1:
-                primSchema = UsdLux.DiskLight.Define(self.GetUsdStage(), self.GetUsdPath())
+                self.schema = UsdLux.DiskLight
             elif shape == 2:
-                primSchema = UsdLux.SphereLight.Define(self.GetUsdStage(), self.GetUsdPath())
+                self.schema = UsdLux.SphereLight
             elif shape == 3:
-                primSchema = UsdLux.CylinderLight.Define(self.GetUsdStage(), self.GetUsdPath())
+                self.schema = UsdLux.CylinderLight
             else:
                  #just for now catch any types we didn't grab before
-                 primSchema = UsdLux.RectLight.Define(self.GetUsdStage(), self.GetUsdPath())
+                 self.schema = UsdLux.RectLight
         elif lightType == 3:
-            primSchema = UsdLux.DistantLight.Define(self.GetUsdStage(), self.GetUsdPath())
+            self.schema = UsdLux.DistantLight
         else:
             #just for now catch any types we didn't grab before
-            primSchema = UsdLux.RectLight.Define(self.GetUsdStage(), self.GetUsdPath())
-        
+            self.schema = UsdLux.RectLight
+
+        stage = self.GetUsdStage()
+        primSchema = self.schema.Define(stage, self.GetUsdPath())
         usdPrim = primSchema.GetPrim()
 
+        self.animated = any(IsAnimated(self.plugs[name]) for name in presetPlugNames)
+        self.local = self.animated or stage.GetRootLayer().anonymous
+        if self.local:
+            self.writeShape(usdPrim)
+        else:
+            usdPrim.GetReferences().AddInternalReference(self.getPrototype(stage))
+
         self._SetUsdPrim(usdPrim)
 
+    def getPrototype(self, stage):
+        #the stage is the only state shared by the writers of one export, so the existing prototypes are looked up on it,
+        #this also picks up prototypes already in the layer when appending to it, GetAllChildren since children of a class prim are abstract
+        rootPrim = stage.GetPrimAtPath(self.prototypeRoot)
+        if not rootPrim:
+            rootPrim = stage.CreateClassPrim(self.prototypeRoot)
+
+        presetKey = repr((self.schema.__name__,) + tuple(ReadPreset(self.plugs[name]) for name in presetPlugNames))
+        for prototypePrim in rootPrim.GetAllChildren():
+            if prototypePrim.GetCustomDataByKey(self.presetKey) == presetKey:
+                return prototypePrim.GetPath()
+
+        index = len(rootPrim.GetAllChildren())
+        prototypePath = self.prototypeRoot.AppendChild("%s_%d" % (self.schema.__name__, index))
+        while stage.GetPrimAtPath(prototypePath):
+            index += 1
+            prototypePath = self.prototypeRoot.AppendChild("%s_%d" % (self.schema.__name__, index))
+
+        prototypePrim = self.schema.Define(stage, prototypePath).GetPrim()
+        prototypePrim.SetCustomDataByKey(self.presetKey, presetKey)
+        self.writeShape(prototypePrim)
+        self.writeLight(prototypePrim, Usd.TimeCode.Default())
+        return prototypePath
+
+    def writeShape(self, usdPrim):
+        #it would probably nicer to remove the scale and set these correctly based on the scale, as to avoid the lights having scales
+        #on them in other apps
+        lightPrim = self.schema(usdPrim)
+        if self.schema == UsdLux.RectLight:
+            lightPrim.CreateWidthAttr().Set(2.0)
+            lightPrim.CreateHeightAttr().Set(2.0)
+        elif self.schema in (UsdLux.DiskLight, UsdLux.SphereLight):
+            lightPrim.CreateRadiusAttr().Set(1)
+        elif self.schema == UsdLux.CylinderLight:
+            lightPrim.CreateRadiusAttr().Set(1)
+            lightPrim.CreateLengthAttr().Set(2)
+
+    def writeLight(self, usdPrim, usdTime):
+        lightPrim = self.schema(usdPrim)
+        WriteProperty(lightPrim.CreateIntensityAttr(), self.plugs["intensity"], usdTime)
+        WriteProperty(lightPrim.CreateExposureAttr(), self.plugs["exposure"], usdTime)
+        if self.plugs["colorMode"].asInt() == 1:
+            lightPrim.CreateEnableColorTemperatureAttr(True)
+        WriteProperty(lightPrim.CreateColorTemperatureAttr(), self.plugs["temperature"], usdTime)
+        WritePropertyColor(lightPrim.CreateColorAttr(), self.plugs["color"], usdTime)
+
     def Write(self, usdTime):
         try:
-            node = om2.MFnDependencyNode(self.GetMayaObject())
-
-            usdPrim = self.GetUsdPrim()
-            lightPrim = UsdLux.RectLight(usdPrim)
-
-            #it would probably nicer to remove the scale and set these correctly based on the scale, as to avoid the lights having scales
-            #on them in other apps
-            lightPrim.CreateWidthAttr().Set(2.0, usdTime)
-            lightPrim.CreateHeightAttr().Set(2.0, usdTime)
-
-            WriteProperty(lightPrim.CreateIntensityAttr(), node, "intensity", usdTime)
-            WriteProperty(lightPrim.CreateExposureAttr(), node, "exposure", usdTime)
-            if node.findPlug("colorMode", True).asInt() == 1:
-                lightPrim.CreateEnableColorTemperatureAttr(True)
-            WriteProperty(lightPrim.CreateColorTemperatureAttr(), node, "temperature", usdTime)
-            WritePropertyColor(lightPrim.CreateColorAttr(), node, "color", usdTime)
-
-            if usdPrim.GetTypeName() == "DiskLight":
-                lightPrim = UsdLux.DiskLight(usdPrim)
-                lightPrim.CreateRadiusAttr().Set(1)
-            elif usdPrim.GetTypeName() == "SphereLight":
-                lightPrim = UsdLux.SphereLight(usdPrim)
-                lightPrim.CreateRadiusAttr().Set(1)
-            elif usdPrim.GetTypeName() == "CylinderLight":
-                lightPrim = UsdLux.SphereLight(usdPrim)
-                lightPrim.CreateRadiusAttr().Set(1)
-                lightPrim.CreateLengthAttr().Set(2)
+            #shared lights get everything from their prototype
+            if self.local:
+                self.writeLight(self.GetUsdPrim(), usdTime)
 
         except Exception as e:
             print('Write() - Error: %s' % str(e))
@@ -110,13 +156,23 @@ class RSProcuderalPrimReference(mayaUsd.lib.PrimWriter):
         return mayaUsd.lib.PrimWriter.ContextSupport.Unsupported
 
 
-def WriteProperty(usdAttribute, depNode, property, usdTime):
-    mayaAttr = depNode.findPlug(property, True)
-    usdAttribute.Set(mayaAttr.asFloat(), usdTime)
+def WriteProperty(usdAttribute, plug, usdTime):
+    usdAttribute.Set(plug.asFloat(), usdTime)
+
+def WritePropertyColor(usdAttribute, plug, usdTime):
+    usdAttribute.Set((plug.child(0).asFloat(), plug.child(1).asFloat(), plug.child(2).asFloat()), usdTime)
+
+def IsAnimated(plug):
+    if plug.isDestination:
+        return True
+    if plug.isCompound:
+        return any(plug.child(i).isDestination for i in range(plug.numChildren()))
+    return False
 
-def WritePropertyColor(usdAttribute, depNode, property, usdTime):
-    mayaAttr = depNode.findPlug(property, True)
-    usdAttribute.Set((mayaAttr.child(0).asFloat(), mayaAttr.child(1).asFloat(), mayaAttr.child(2).asFloat()), usdTime)
+def ReadPreset(plug):
+    if plug.isCompound:
+        return tuple(plug.child(i).asFloat() for i in range(plug.numChildren()))
+    return plug.asFloat()
     
 mayaUsd.lib.PrimWriter.Register(RSLightPrimWriter, "RedshiftPhysicalLight")
 #mayaUsd.lib.PrimWriter.Register(RSProcuderalPrimReference, "mesh")